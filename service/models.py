@@ -31,6 +31,7 @@ available (boolean) - True for products that are available for adoption
 import logging
 from enum import Enum
 from decimal import Decimal
+from typing import Optional
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
@@ -175,6 +176,18 @@ class Product(db.Model):
         logger.info("Processing all Products")
         return cls.query.all()
 
+    @classmethod
+    def count(cls) -> int:
+        """Returns the number of Products in the database"""
+        logger.info("Processing count of Products")
+        return cls.query.count()
+
+    @classmethod
+    def first(cls) -> Optional["Product"]:
+        """Returns the Product with the lowest id, or None if there are none"""
+        logger.info("Processing first Product")
+        return cls.query.order_by(cls.id).first()
+
     @classmethod
     def find(cls, product_id: int):
         """Finds a Product by it's ID
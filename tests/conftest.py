@@ -0,0 +1,211 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+# pylint: disable=redefined-outer-name
+
+"""
+Shared pytest fixtures
+
+The test suite can be run in parallel with:
+    pytest -n auto --dist loadgroup
+"""
+import os
+import logging
+from collections import Counter
+import pytest
+from sqlalchemy import delete, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, raiseload, scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from flask_sqlalchemy.cli import add_models_to_shell
+from service import app
+from service.models import db, Product
+from tests.factories import ProductFactory
+from tests.database import (
+    start_test_run,
+    lock_test_run,
+    worker_database_uri,
+    create_worker_database,
+    drop_database,
+    drop_test_run,
+)
+
+# every worker is its own process, one connection is all a worker needs
+POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "1"))
+# whether any test of this run needed the database
+USED_DATABASE = pytest.StashKey[bool]()
+
+
+def pytest_configure(config):
+    """Names this run's databases before any xdist worker is started"""
+    # xdist workers have workerinput, the controller and plain runs do not
+    if not hasattr(config, "workerinput"):
+        start_test_run()
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):  # pylint: disable=unused-argument
+    """Collects on the controller whether a worker used the database"""
+    # a worker that crashed has no workeroutput
+    if getattr(node, "workeroutput", {}).get("used_database"):
+        node.config.stash[USED_DATABASE] = True
+
+
+def pytest_unconfigure(config):
+    """Drops the template, and the databases of crashed workers, once the run is over
+
+    Whatever is left when a run is aborted is dropped by the next run that
+    builds a template.
+    """
+    if not hasattr(config, "workerinput") and config.stash.get(USED_DATABASE, False):
+        drop_test_run()
+
+
+@pytest.fixture(scope="session")
+def database_uri():
+    """The database URI for this pytest-xdist worker"""
+    return worker_database_uri()
+
+
+@pytest.fixture(scope="session")
+def worker_database(request, database_uri):
+    """Gives this worker a fresh copy of the template database
+
+    It is only created for the tests that need it, and dropped again when the
+    worker is done with it.
+    """
+    run_lock = lock_test_run()
+    create_worker_database(database_uri, db.metadata)
+    if hasattr(request.config, "workeroutput"):
+        request.config.workeroutput["used_database"] = True
+    else:
+        request.config.stash[USED_DATABASE] = True
+    app.config["TESTING"] = True
+    app.config["DEBUG"] = False
+    app.logger.setLevel(logging.CRITICAL)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
+    # keep the worker's connection open for the whole test run
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "poolclass": QueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": 0,
+        "pool_pre_ping": False,
+        "pool_reset_on_return": None,
+        # insert, update and delete batches of rows in single round trips
+        "executemany_mode": "values_plus_batch",
+    }
+    # Importing service already ran init_db() and create_all on the default
+    # database. init_app replaces the app's engine, so every app context,
+    # the one pushed at import included, now uses the worker database.
+    # Flask only allows init_app before the first request, so it is done once
+    # per worker here rather than in every test class
+    db.init_app(app)
+    # init_app registered these a second time, drop the copies it just added
+    app.teardown_appcontext_funcs.remove(db._teardown_session)  # pylint: disable=protected-access
+    app.shell_context_processors.remove(add_models_to_shell)
+    yield database_uri
+    with app.app_context():
+        # Postgres will not drop a database that still has connections open
+        db.engine.dispose()
+    drop_database(make_url(database_uri).database)
+    run_lock.close()
+
+
+@pytest.fixture(scope="session")
+def app_context(worker_database):  # pylint: disable=unused-argument
+    """Shares one app context, and so one app session, across all the tests"""
+    context = app.app_context()
+    context.push()
+    yield context
+    db.session.remove()
+    context.pop()
+
+
+def _raiseload_all(orm_execute_state):
+    """Adds raiseload('*') to every ORM SELECT the tests run"""
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def raise_on_lazy_load():
+    """Turns lazy loading of a relationship into an error
+
+    A lazy load would quietly issue one more SELECT per object (N+1 queries),
+    so relationships the tests use have to be loaded eagerly.
+    """
+    event.listen(Session, "do_orm_execute", _raiseload_all)
+    yield
+    event.remove(Session, "do_orm_execute", _raiseload_all)
+
+
+@pytest.fixture(scope="session")
+def savepoint_session():
+    """The session db_session swaps in, created once and rebound for each test"""
+    session = scoped_session(sessionmaker(join_transaction_mode="create_savepoint"))
+    yield session
+    session.remove()
+
+
+@pytest.fixture
+def db_session(app_context, savepoint_session, monkeypatch):  # pylint: disable=unused-argument
+    """Runs a test inside a transaction that is rolled back afterwards
+
+    The session joins the transaction with SAVEPOINTs, so commit() in the
+    model only releases a savepoint and nothing is ever written for real.
+    """
+    conn = db.engine.connect()
+    trans = conn.begin()
+    savepoint_session.bind = conn
+    monkeypatch.setattr(db, "session", savepoint_session)
+    yield savepoint_session
+    savepoint_session.close()  # forget this test's objects, but keep the session
+    trans.rollback()
+    conn.close()
+
+
+@pytest.fixture
+def product(db_session):  # pylint: disable=unused-argument
+    """A Product saved in the rolled back transaction of db_session"""
+    new_product = ProductFactory()
+    new_product.create()
+    return new_product
+
+
+@pytest.fixture(scope="class")
+def product_batch_10(app_context):  # pylint: disable=unused-argument
+    """Commits ten products that a whole test class can query"""
+    products = ProductFactory.create_batch(10)
+    # don't expire the products so the tests can read them without a session
+    with Session(db.engine, expire_on_commit=False) as session:
+        session.add_all(products)
+        session.commit()
+    yield products
+    with db.engine.begin() as conn:
+        conn.execute(delete(Product).where(Product.id.in_([product.id for product in products])))
+
+
+@pytest.fixture(scope="class")
+def product_batch_10_counts(product_batch_10):
+    """How many of the batch have each name, availability, category and price"""
+    return {
+        field: Counter(getattr(product, field) for product in product_batch_10)
+        for field in ("name", "available", "category", "price")
+    }
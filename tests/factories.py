@@ -21,16 +21,22 @@ import factory
 from factory.fuzzy import FuzzyChoice, FuzzyDecimal
 from service.models import Product, Category
 
+# Seed Faker and the fuzzy attributes once so every run gets the same products
+factory.random.reseed_random("tdd-bdd-final-project")
+
 
 class ProductFactory(factory.Factory):
-    """Creates fake products for testing"""
+    """Creates fake products for testing
+
+    The products are not saved and have no id, the database assigns one when
+    they are created.
+    """
 
     class Meta:
         """Maps factory to data model"""
 
         model = Product
 
-    id = factory.Sequence(lambda n: n)
     name = FuzzyChoice(
         choices=[
             "Hat",
@@ -46,7 +52,7 @@ class ProductFactory(factory.Factory):
             "Wrench"
         ]
     )
-    description = factory.Faker("text")
+    description = factory.Faker("text", locale="en_US")
     price = FuzzyDecimal(0.5, 2000.0, 2)
     available = FuzzyChoice(choices=[True, False])
     category = FuzzyChoice(